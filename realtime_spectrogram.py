@@ -1,41 +1,125 @@
 # --- Necessary Imports ---
+import os
 import sys
 import platform
-import time
 import traceback
 import warnings
 import numpy as np
 from scipy.signal import get_window
+from scipy.fft import rfft, set_workers # Keeps float32 -> complex64 (numpy.fft upcasts to complex128)
 import soundcard as sc
 import pyqtgraph as pg
 from PyQt6 import QtWidgets, QtCore, QtGui
 import matplotlib # Import base library
 import matplotlib.cm
+try: # Optional: pre-planned FFTW transforms (falls back to scipy.fft)
+    import pyfftw; PYFFTW_AVAILABLE = True
+except ImportError: pyfftw = None; PYFFTW_AVAILABLE = False
+try: # Optional: JIT-compiled history quantize kernel (falls back to in-place numpy ufuncs)
+    from numba import njit; NUMBA_AVAILABLE = True
+except ImportError: NUMBA_AVAILABLE = False
+try: # Optional: cuFFT via CuPy (used only when an NVIDIA device is present)
+    import cupy as cp; CUPY_AVAILABLE = cp.cuda.is_available()
+except Exception: cp = None; CUPY_AVAILABLE = False
 
 # --- Configuration Constants ---
 DEFAULT_SAMPLE_RATE = 44100; DEFAULT_CHUNK_SIZE = 1024 * 2; DEFAULT_N_FFT = DEFAULT_CHUNK_SIZE
 DEFAULT_FREQ_SCALE = 'Logarithmic'; DEFAULT_COLORMAP = 'viridis'; DEFAULT_VERBOSE_CONSOLE = False
 DEFAULT_SUPPRESS_WARNINGS = True; DEFAULT_SPEC_DB_MIN = -70.0; DEFAULT_SPEC_DB_MAX = 10.0
-DEFAULT_RESP_HEADROOM = 10.0;
+DEFAULT_RESP_HEADROOM = 10.0; DEFAULT_USE_GPU = True
 WINDOW_TYPE = 'hann'; HISTORY_SECONDS = 10.0; PLOT_FREQ_MIN_HZ = 10
 # *** Added Timer Interval ***
 UPDATE_INTERVAL_MS = 40  # Approx 25 FPS for GUI updates
+FFT_WORKERS = 2 # Threads for pyFFTW plans and scipy.fft
+FFTW_PLANNING_TIMELIMIT = 0.5 # Seconds FFTW_PATIENT may spend planning a size it has no wisdom for; keep well under AUDIO_STOP_WAIT_MS
+AUDIO_STOP_WAIT_MS = 1500 # How long closeEvent waits for the audio thread to exit
+FFTW_WISDOM_FILE = os.path.join(os.path.expanduser('~'), '.realtime_spectrogram_fftw_wisdom.npz')
+DB_EPSILON = 1e-9 # Added to magnitudes before log10
+GPU_MIN_FFT_SIZE = 4096 # Smaller FFTs stay on the CPU: per-chunk transfers and launches cost more than cuFFT saves
+AUDIO_RING_SLOTS = 16 # dB frames buffered between the audio thread and a paint (~190 frames/s at 96 kHz / 512 vs 25 paints/s)
+RESP_CURVE_MAX_POINTS = 1024 # Response curves are peak-decimated to about the plot's pixel width
+RESP_YLIM_RELEASE = 0.1 # One-pole smoothing of a falling response Y limit, per paint
+RESP_YLIM_STEP_DB = 1.0 # Smallest response Y-range change worth an axis relayout
 
 SUPPORTED_SAMPLE_RATES = [8000, 11025, 16000, 22050, 32000, 44100, 48000, 88200, 96000]
 SUPPORTED_FFT_SIZES = [512, 1024, 2048, 4096, 8192, 16384]
 # User preferred list
 SUPPORTED_COLORMAPS = ['cividis', 'inferno', 'magma', 'plasma', 'turbo', 'viridis']
+# Config dialog key -> MainWindow attribute, and the keys whose change needs recalculate_vars_and_configure_plots
+SETTING_ATTRS = {'sample_rate': 'current_sample_rate', 'fft_size': 'current_fft_size', 'freq_scale': 'current_freq_scale', 'colormap': 'current_colormap',
+                 'spec_db_min': 'current_spec_db_min', 'spec_db_max': 'current_spec_db_max', 'resp_headroom': 'current_resp_headroom',
+                 'verbose': 'verbose_console', 'suppress_warnings': 'suppress_warnings', 'use_gpu': 'current_use_gpu'}
+RECALC_KEYS = frozenset({'sample_rate', 'fft_size', 'freq_scale', 'colormap', 'spec_db_min', 'spec_db_max', 'resp_headroom'})
 
 # --- Globals ---
 main_window = None
 
+# --- DSP Kernels ---
+def _mag_db(spectrum, out, eps): # 20*log10(|X| + eps) written in place with SIMD ufuncs, no temporaries; returns the peak dB
+    np.abs(spectrum, out=out); out += eps; np.log10(out, out=out); out *= 20.0
+    return float(out.max())
+
+def _quantize_frame_numpy(db_L, db_R, db_min, scale, scratch, hist_L, hist_R, row, frames): # dB -> nearest uint8 level, written to both history tiles (time is axis 0)
+    for db, hist in ((db_L, hist_L), (db_R, hist_R)):
+        np.subtract(db, db_min, out=scratch); scratch *= scale; scratch += 0.5; np.minimum(scratch, 255.0, out=scratch); np.maximum(scratch, 0.0, out=scratch) # Two one-sided clips beat two-sided np.clip
+        hist[row] = scratch; hist[row + frames] = hist[row]
+if NUMBA_AVAILABLE:
+    @njit(nogil=True, fastmath=True, cache=not getattr(sys, 'frozen', False))
+    def _quantize_frame(db_L, db_R, db_min, scale, scratch, hist_L, hist_R, row, frames): # Same, both channels in one pass and without holding the GIL
+        for i in range(db_L.shape[0]):
+            v = (db_L[i] - db_min) * scale + 0.5 # +0.5 so the truncating cast rounds to nearest
+            if v < 0.0: v = 0.0
+            elif v > 255.0: v = 255.0
+            q = np.uint8(v); hist_L[row, i] = q; hist_L[row + frames, i] = q
+            v = (db_R[i] - db_min) * scale + 0.5
+            if v < 0.0: v = 0.0
+            elif v > 255.0: v = 255.0
+            q = np.uint8(v); hist_R[row, i] = q; hist_R[row + frames, i] = q
+    _quantize_frame(np.zeros(2, dtype=np.float32), np.zeros(2, dtype=np.float32), DEFAULT_SPEC_DB_MIN, 1.0, np.empty(2, dtype=np.float32), np.zeros((2, 2), dtype=np.uint8), np.zeros((2, 2), dtype=np.uint8), 0, 1) # Warm the JIT
+else: _quantize_frame = _quantize_frame_numpy
+
+_WINDOW_CACHE = {} # (type, size) -> read-only float32 window, shared by every AudioProcessor
+def _cached_window(name, size):
+    window = _WINDOW_CACHE.get((name, size))
+    if window is None: window = get_window(name, size).astype(np.float32); window.flags.writeable = False; _WINDOW_CACHE[(name, size)] = window
+    return window
+
+# --- FFTW Wisdom (persisted so patient plans are only measured once per size) ---
+def _load_fftw_wisdom():
+    try:
+        with np.load(FFTW_WISDOM_FILE, allow_pickle=False) as z: pyfftw.import_wisdom(tuple(z[f'arr_{i}'].tobytes() for i in range(len(z.files))))
+    except FileNotFoundError: pass
+    except Exception as e: print(f"Note: Could not load FFTW wisdom: {e}")
+def _save_fftw_wisdom(wisdom):
+    try: np.savez(FFTW_WISDOM_FILE, *[np.frombuffer(w, dtype=np.uint8) for w in wisdom])
+    except Exception as e: print(f"Note: Could not save FFTW wisdom: {e}")
+if PYFFTW_AVAILABLE: _load_fftw_wisdom()
+
+# --- Colormap / LUT Cache ---
+_COLORMAP_CACHE = {} # name -> (ColorMap, uint8 lookup table)
+def _load_colormap(name): # pyqtgraph first, then matplotlib, then 'viridis'
+    try: return pg.colormap.get(name)
+    except Exception: pass
+    try: cmap = pg.colormap.getFromMatplotlib(name)
+    except Exception: cmap = None
+    if cmap is None:
+        if DEFAULT_VERBOSE_CONSOLE: print(f"Colormap '{name}' not found, falling back to 'viridis'.")
+        cmap = pg.colormap.get('viridis')
+    return cmap
+def get_colormap_lut(name): # Resolved once per name; later calls are a dict lookup
+    if name not in _COLORMAP_CACHE: cmap = _load_colormap(name); _COLORMAP_CACHE[name] = (cmap, cmap.getLookupTable(nPts=256, alpha=False, mode='byte')) # One entry per uint8 level
+    return _COLORMAP_CACHE[name]
+for _name in SUPPORTED_COLORMAPS: get_colormap_lut(_name) # Warm at import so Config OK never walks the matplotlib fallback
+
+# --- Verbose Logging ---
+def _no_log(*args, **kwargs): pass
+def _verbose_logger(): # Snapshot of the verbose setting: print when enabled, a no-op otherwise
+    return print if getattr(main_window, 'verbose_console', DEFAULT_VERBOSE_CONSOLE) else _no_log
+
 # --- Warning Filtering ---
 def update_warning_filter(suppress):
-    # ... (function unchanged) ...
     action = "ignore" if suppress else "default"; warnings.filterwarnings(action, message=".*data discontinuity.*")
-    status = "suppressed" if suppress else "enabled"; verbose = DEFAULT_VERBOSE_CONSOLE
-    if main_window is not None and hasattr(main_window, 'verbose_console'): verbose = main_window.verbose_console
-    if verbose: print(f"Soundcard discontinuity warnings {status}.")
+    _log = _verbose_logger(); _log("Soundcard discontinuity warnings", "suppressed." if suppress else "enabled.")
 
 
 # --- Error Reporting ---
@@ -114,26 +198,76 @@ def find_loopback_device(): # ... (unchanged) ...
 
 # --- Audio Processing Thread (Added Error Signal) ---
 class AudioProcessor(QtCore.QThread):
-    newData = QtCore.pyqtSignal(dict); finished = QtCore.pyqtSignal(); errorOccurred = QtCore.pyqtSignal(str)
-    def __init__(self, device, sample_rate, chunk_size, n_fft, window): super().__init__(); self.device = device; self.sample_rate = sample_rate; self.chunk_size = chunk_size; self.n_fft = n_fft; self.window = window; self._is_running = False; self.recorder = None; self.num_channels = device.channels
+    finished = QtCore.pyqtSignal(); errorOccurred = QtCore.pyqtSignal(str) # No per-frame signal: the GUI's paint timer polls frames_written
+    def __init__(self, device, sample_rate, chunk_size, n_fft, window, use_gpu=DEFAULT_USE_GPU):
+        super().__init__(); self.device = device; self.sample_rate = sample_rate; self.chunk_size = chunk_size; self.n_fft = n_fft; self.window = window; self._is_running = False; self.recorder = None; self.num_channels = device.channels
+        # *** Pre-planned real FFT (pyFFTW) with aligned, reused buffers ***
+        n_bins = n_fft // 2 + 1; self._n_in = min(chunk_size, n_fft); self._plan = None
+        self._padded = n_fft > self._n_in # Zero padding is written once, so the FFT must then preserve its input
+        # *** dB output ring (slot, channel, bin): the GUI drains every slot written since its last read ***
+        self.ring = np.empty((AUDIO_RING_SLOTS, 2, n_bins), dtype=np.float32); self.ring_L, self.ring_R = self.ring[:, 0], self.ring[:, 1]
+        self.ring_peak = np.zeros(AUDIO_RING_SLOTS) # Peak dB of each slot over both channels, found while the slot is written
+        self.ring_locks = [QtCore.QMutex() for _ in range(AUDIO_RING_SLOTS)]; self.frames_written = 0
+        self._pending = np.empty((chunk_size, self.num_channels), dtype=np.float32); self._pending_len = 0 # Short reads accumulate here
+        # *** Contiguous (2, n_fft) SoA frame; mono is broadcast into both rows, so no per-chunk channel branch ***
+        self._channels = slice(0, 2) if self.num_channels >= 2 else slice(0, 1)
+        self._frame = pyfftw.zeros_aligned((2, n_fft), dtype='float32') if PYFFTW_AVAILABLE else np.zeros((2, n_fft), dtype=np.float32)
+        self.use_gpu = use_gpu and CUPY_AVAILABLE and n_fft >= GPU_MIN_FFT_SIZE and self._setup_gpu(n_fft, n_bins) # Replaces the frame with pinned memory on success
+        if PYFFTW_AVAILABLE and not self.use_gpu: self._spectrum = pyfftw.empty_aligned((2, n_bins), dtype='complex64') # Plan is built in run()
+    def build_plan(self): # One batched FFTW_PATIENT plan for this (chunk_size, n_fft), built on the audio thread when it starts
+        wisdom = pyfftw.export_wisdom()
+        flags = ('FFTW_PATIENT',) if self._padded else ('FFTW_PATIENT', 'FFTW_DESTROY_INPUT') # Planning scribbles over the input, so zero it after
+        self._plan = pyfftw.FFTW(self._frame, self._spectrum, axes=(-1,), direction='FFTW_FORWARD', flags=flags, threads=FFT_WORKERS, planning_timelimit=FFTW_PLANNING_TIMELIMIT)
+        self._frame.fill(0.0)
+        new_wisdom = pyfftw.export_wisdom()
+        if new_wisdom != wisdom: _save_fftw_wisdom(new_wisdom)
+    def _setup_gpu(self, n_fft, n_bins): # Pinned host staging + persistent device buffers on a dedicated stream
+        try:
+            self._stream = cp.cuda.Stream(non_blocking=True)
+            self._frame = np.frombuffer(cp.cuda.alloc_pinned_memory(2 * n_fft * 4), np.float32, 2 * n_fft).reshape(2, n_fft); self._frame.fill(0.0)
+            self._h_db = np.frombuffer(cp.cuda.alloc_pinned_memory(2 * n_bins * 4), np.float32, 2 * n_bins).reshape(2, n_bins)
+            self._d_in = cp.empty((2, n_fft), dtype=cp.float32); self._d_db = cp.empty((2, n_bins), dtype=cp.float32)
+            return True
+        except Exception as e: print(f"GPU FFT unavailable, using CPU: {type(e).__name__}: {e}"); return False
+    def _gpu_mag_db(self): # Both channels in one batched cuFFT; dB computed on-device, result lands in self._h_db
+        with self._stream:
+            self._d_in.set(self._frame, stream=self._stream); spectrum = cp.fft.rfft(self._d_in, axis=1)
+            cp.abs(spectrum, out=self._d_db); self._d_db += DB_EPSILON; cp.log10(self._d_db, out=self._d_db); self._d_db *= 20.0
+            self._d_db.get(stream=self._stream, out=self._h_db)
+        self._stream.synchronize()
+    def _accumulate(self, data): # Returns a full chunk once short reads add up to one, else None
+        take = min(self.chunk_size - self._pending_len, data.shape[0]) # record() is asked for exactly the remainder
+        self._pending[self._pending_len:self._pending_len + take] = data[:take]; self._pending_len += take
+        if self._pending_len < self.chunk_size: return None
+        self._pending_len = 0; return self._pending
+    def _load_frame(self, data): # Window the interleaved recorder block straight into the contiguous SoA frame
+        n = self._n_in; audio = np.asarray(data, dtype=np.float32)
+        np.multiply(audio[:n, self._channels].T, self.window[:n], out=self._frame[:, :n]) # Padding beyond n stays zero
     def run(self):
-        self._is_running = True; verbose = DEFAULT_VERBOSE_CONSOLE; global main_window
-        if main_window is not None and hasattr(main_window, 'verbose_console'): verbose = main_window.verbose_console
-        if verbose: print(f"AudioProcessor thread started (Rate: {self.sample_rate}, Chunk: {self.chunk_size}, FFT: {self.n_fft}).")
+        self._is_running = True; _log = _verbose_logger() # Verbose setting is snapshotted once per thread start
+        _log(f"AudioProcessor thread started (Rate: {self.sample_rate}, Chunk: {self.chunk_size}, FFT: {self.n_fft}, GPU: {self.use_gpu}).")
         try:
+            if PYFFTW_AVAILABLE and not self.use_gpu and self._plan is None: self.build_plan(); _log("FFTW plan ready.")
             with self.device.recorder(samplerate=self.sample_rate, channels=self.num_channels, blocksize=self.chunk_size) as self.recorder:
                 if self.recorder is None: raise RuntimeError("Failed to create recorder object in thread.")
-                if verbose: print(f"Recorder created: {self.recorder}")
+                _log("Recorder created:", self.recorder)
                 while self._is_running:
-                    data = self.recorder.record(numframes=self.chunk_size)
+                    data = self.recorder.record(numframes=self.chunk_size - self._pending_len)
                     if not self._is_running: break
-                    if data is None or data.shape[0] < self.chunk_size: time.sleep(0.005); continue
-                    if self.num_channels >= 2: audio_L, audio_R = data[:, 0], data[:, 1]
-                    else: audio_L = audio_R = data[:, 0]
-                    windowed_L = audio_L * self.window; fft_L = np.fft.rfft(windowed_L, n=self.n_fft); magnitude_L = np.abs(fft_L); db_magnitude_L = 20 * np.log10(magnitude_L + 1e-9)
-                    windowed_R = audio_R * self.window; fft_R = np.fft.rfft(windowed_R, n=self.n_fft); magnitude_R = np.abs(fft_R); db_magnitude_R = 20 * np.log10(magnitude_R + 1e-9)
-                    processed_data = {'db_L': db_magnitude_L,'db_R': db_magnitude_R}
-                    if self._is_running: self.newData.emit(processed_data)
+                    if data is None or data.shape[0] == 0: continue # record() blocks, so no backoff sleep is needed
+                    if self._pending_len or data.shape[0] < self.chunk_size: # Short read: top up instead of dropping it
+                        data = self._accumulate(data)
+                        if data is None: continue
+                    self._load_frame(data); slot = self.frames_written % AUDIO_RING_SLOTS
+                    if self.use_gpu:
+                        self._gpu_mag_db()
+                        with QtCore.QMutexLocker(self.ring_locks[slot]): np.copyto(self.ring[slot], self._h_db); self.ring_peak[slot] = self._h_db.max()
+                    else:
+                        if self._plan is not None: self._plan.execute(); spectrum = self._spectrum
+                        else: # scipy.fft fallback; an unpadded frame is rebuilt every chunk, so the FFT may overwrite it
+                            with set_workers(FFT_WORKERS): spectrum = rfft(self._frame, axis=1, overwrite_x=not self._padded)
+                        with QtCore.QMutexLocker(self.ring_locks[slot]): self.ring_peak[slot] = _mag_db(spectrum.ravel(), self.ring[slot].ravel(), DB_EPSILON) # Both channels in one pass
+                    self.frames_written += 1
         except Exception as e:
             error_msg = f"Error in AudioProcessor run loop: {type(e).__name__}: {e}"; print(error_msg, file=sys.stderr); traceback.print_exc(file=sys.stderr)
             if self._is_running: self.errorOccurred.emit(error_msg)
@@ -142,7 +276,6 @@ class AudioProcessor(QtCore.QThread):
 
 # --- Configuration Dialog ---
 class ConfigDialog(QtWidgets.QDialog):
-    # ... (class unchanged) ...
     def __init__(self, current_settings, parent=None):
         super().__init__(parent); self.setWindowTitle("Configuration"); self.layout = QtWidgets.QVBoxLayout(self); self.formLayout = QtWidgets.QFormLayout(); self.current_settings = current_settings
         self.sampleRateCombo = QtWidgets.QComboBox(); self.sampleRateCombo.addItems([str(rate) for rate in SUPPORTED_SAMPLE_RATES]); self.sampleRateCombo.setCurrentText(str(current_settings.get('sample_rate', DEFAULT_SAMPLE_RATE))); self.formLayout.addRow("Sample Rate (Hz):", self.sampleRateCombo)
@@ -157,6 +290,7 @@ class ConfigDialog(QtWidgets.QDialog):
         self.respHeadroomSpin = QtWidgets.QDoubleSpinBox(); self.respHeadroomSpin.setRange(0.0, 60.0); self.respHeadroomSpin.setValue(current_settings.get('resp_headroom', DEFAULT_RESP_HEADROOM)); self.respHeadroomSpin.setSingleStep(1.0); self.formLayout.addRow("Freq. Resp. Headroom (dB):", self.respHeadroomSpin)
         self.verboseCheck = QtWidgets.QCheckBox("Enable Verbose Console Output"); self.verboseCheck.setChecked(current_settings.get('verbose', DEFAULT_VERBOSE_CONSOLE)); self.formLayout.addRow(self.verboseCheck)
         self.suppressWarnCheck = QtWidgets.QCheckBox("Suppress Discontinuity Warnings"); self.suppressWarnCheck.setChecked(current_settings.get('suppress_warnings', DEFAULT_SUPPRESS_WARNINGS)); self.formLayout.addRow(self.suppressWarnCheck)
+        self.useGpuCheck = QtWidgets.QCheckBox(f"Use GPU for FFT Sizes >= {GPU_MIN_FFT_SIZE}"); self.useGpuCheck.setChecked(current_settings.get('use_gpu', DEFAULT_USE_GPU)); self.useGpuCheck.setEnabled(CUPY_AVAILABLE); self.formLayout.addRow(self.useGpuCheck)
         self.layout.addLayout(self.formLayout)
         self.buttonBox = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.StandardButton.Ok | QtWidgets.QDialogButtonBox.StandardButton.Cancel)
         self.buttonBox.accepted.connect(self.accept); self.buttonBox.rejected.connect(self.reject); self.layout.addWidget(self.buttonBox)
@@ -166,7 +300,7 @@ class ConfigDialog(QtWidgets.QDialog):
                 'freq_scale': freq_scale, 'colormap': self.colormapCombo.currentText(),
                 'spec_db_min': self.specMinDbSpin.value(), 'spec_db_max': self.specMaxDbSpin.value(),
                 'resp_headroom': self.respHeadroomSpin.value(),
-                'verbose': self.verboseCheck.isChecked(), 'suppress_warnings': self.suppressWarnCheck.isChecked()}
+                'verbose': self.verboseCheck.isChecked(), 'suppress_warnings': self.suppressWarnCheck.isChecked(), 'use_gpu': self.useGpuCheck.isChecked()}
 
 # --- Custom Axis Class for Hz/kHz Formatting ---
 class CustomFreqAxis(pg.AxisItem):
@@ -185,22 +319,23 @@ class MainWindow(QtWidgets.QMainWindow):
     def __init__(self, device):
         super().__init__(); global selected_device, actual_sample_rate, main_window; main_window = self; self.device = selected_device
         self.current_sample_rate = actual_sample_rate; self.current_fft_size = DEFAULT_N_FFT; self.current_chunk_size = DEFAULT_CHUNK_SIZE
-        self.current_freq_scale = DEFAULT_FREQ_SCALE; self.current_colormap = DEFAULT_COLORMAP; self.verbose_console = DEFAULT_VERBOSE_CONSOLE
+        self.current_freq_scale = DEFAULT_FREQ_SCALE; self.current_colormap = DEFAULT_COLORMAP; self.set_verbose(DEFAULT_VERBOSE_CONSOLE)
         self.suppress_warnings = DEFAULT_SUPPRESS_WARNINGS; self.current_spec_db_min = DEFAULT_SPEC_DB_MIN; self.current_spec_db_max = DEFAULT_SPEC_DB_MAX
-        self.current_resp_headroom = DEFAULT_RESP_HEADROOM;
+        self.current_resp_headroom = DEFAULT_RESP_HEADROOM; self.current_use_gpu = DEFAULT_USE_GPU
         self.n_fft = self.current_fft_size; self.num_channels = self.device.channels if self.device else 0
-        self.freq_vector = None; self.time_vector = None; self.spec_history_L = None
-        self.spec_history_R = None; self.window = None; self.history_frames_actual = 0;
+        self.freq_vector = None; self._log_freq_vector = None; self.time_vector = None; self.spec_history_L = None
+        self.spec_history_R = None; self.window = None; self.history_frames_actual = 0; self.hist_write_idx = 0; self._applied_colormap = None
         self.display_mode = 'Spectrogram' # Added state variable
         # *** Variables to store latest data for timer approach ***
         self.latest_db_L = None
-        self.latest_db_R = None
+        self.latest_db_R = None; self.latest_peak_db = None
+        self.frames_read = 0
         # -------------------------------------------------------
         update_warning_filter(self.suppress_warnings)
         self.setup_gui();
         self.recalculate_vars_and_configure_plots();
         # *** Initialize plot timer ***
-        self.plot_timer = QtCore.QTimer()
+        self.plot_timer = QtCore.QTimer(); self.plot_timer.setSingleShot(True); self.plot_timer.timeout.connect(self.update_plots) # Re-armed by each paint, so slow paints cannot queue up
         # -------------------------
         self.audio_thread = None; self.audio_processor = None
         self.is_audio_running = False; self.update_button_states()
@@ -228,8 +363,11 @@ class MainWindow(QtWidgets.QMainWindow):
         self.setWindowTitle(f'Real-time Audio Analysis - {self.device.name if self.device else "No Device"}'); self.setGeometry(100, 100, 1000, 800)
         self.plot_L_spec = self.graph_widget.addPlot(row=0, col=0); self.plot_R_spec = self.graph_widget.addPlot(row=1, col=0)
         self.custom_freq_axis = CustomFreqAxis(orientation='bottom'); self.plot_freq_resp = self.graph_widget.addPlot(row=2, col=0, axisItems={'bottom': self.custom_freq_axis})
+        self.plot_freq_resp.ctrl.logXCheck.setEnabled(False); self.plot_freq_resp.ctrl.logYCheck.setEnabled(False) # Menu log toggles would re-log the pre-logged curves
         self.hist_L = pg.HistogramLUTItem(); self.graph_widget.addItem(self.hist_L, row=0, col=1); self.hist_R = pg.HistogramLUTItem(); self.graph_widget.addItem(self.hist_R, row=1, col=1)
-        self.img_L = pg.ImageItem(); self.plot_L_spec.addItem(self.img_L); self.hist_L.setImageItem(self.img_L); self.img_R = pg.ImageItem(); self.plot_R_spec.addItem(self.img_R); self.hist_R.setImageItem(self.img_R)
+        # Histograms are a colorbar preview only: the images hold uint8 LUT indices, so they are not linked
+        self.img_L = pg.ImageItem(); self.plot_L_spec.addItem(self.img_L); self.img_R = pg.ImageItem(); self.plot_R_spec.addItem(self.img_R)
+        self.hist_L.region.setMovable(False); self.hist_R.region.setMovable(False)
         self.curve_L = self.plot_freq_resp.plot(pen='b', name='Left'); self.curve_R = self.plot_freq_resp.plot(pen='r', name='Right')
         # Connect Control Buttons
         self.startButton.clicked.connect(self.start_audio); self.stopButton.clicked.connect(self.stop_audio); self.configButton.clicked.connect(self.open_config_dialog)
@@ -250,79 +388,77 @@ class MainWindow(QtWidgets.QMainWindow):
         self.plot_freq_resp.setVisible(not show_spectrogram)
     # --------------------------------------
 
-    def print_verbose(self, *args, **kwargs): 
-        if self.verbose_console: print(*args, **kwargs)
+    def set_verbose(self, enabled): # print_verbose is rebound rather than testing the flag per call, so disabled logging is a bare no-op call
+        self.verbose_console = enabled; self.print_verbose = print if enabled else _no_log
 
     # --- recalculate_vars_and_configure_plots using HISTORY_SECONDS ---
     def recalculate_vars_and_configure_plots(self):
-        # ... (Function unchanged - uses HISTORY_SECONDS) ...
         self.print_verbose(f"Recalculating for Rate: {self.current_sample_rate}, FFT: {self.n_fft}")
         try:
             if self.current_sample_rate <= 0 or self.current_chunk_size <= 0: raise ValueError("Sample rate and chunk size must be positive.")
             self.freq_vector = np.fft.rfftfreq(self.n_fft, 1.0 / self.current_sample_rate)
+            self._log_freq_vector = np.log10(np.maximum(self.freq_vector, 1e-6)).astype(np.float32) # Response curve x data, log taken once
+            self._resp_stride = max(1, len(self.freq_vector) // RESP_CURVE_MAX_POINTS); self._resp_len = (len(self.freq_vector) // self._resp_stride) * self._resp_stride
+            self._resp_x = self._log_freq_vector[:self._resp_len:self._resp_stride].copy() # Lowest bin of each decimation group
+            self._resp_y_L = np.empty(len(self._resp_x), dtype=np.float32); self._resp_y_R = np.empty(len(self._resp_x), dtype=np.float32)
+            self._resp_ylim_max = None # Snap, rather than ease, to the limit implied by the new settings
             self.history_frames_actual = max(1, int(np.ceil(HISTORY_SECONDS * self.current_sample_rate / self.current_chunk_size)))
             self.print_verbose(f"  -> History frames: {self.history_frames_actual} for {HISTORY_SECONDS}s")
-            self.time_vector = np.linspace(-HISTORY_SECONDS, 0, self.history_frames_actual)
-            spec_data_shape = (len(self.freq_vector), self.history_frames_actual)
-            self.spec_history_L = np.full(spec_data_shape, self.current_spec_db_min); self.spec_history_R = np.full(spec_data_shape, self.current_spec_db_min)
-            self.window = get_window(WINDOW_TYPE, self.current_chunk_size); self.configure_plots()
+            if self.time_vector is None or len(self.time_vector) != self.history_frames_actual: self.time_vector = np.linspace(-HISTORY_SECONDS, 0, self.history_frames_actual)
+            spec_data_shape = (2 * self.history_frames_actual, len(self.freq_vector)) # (time, freq): two tiled copies of the ring, rows contiguous
+            if self.spec_history_L is None or self.spec_history_L.shape != spec_data_shape: # Reallocate only on a real shape change
+                self.spec_history_L = np.empty(spec_data_shape, dtype=np.uint8); self.spec_history_R = np.empty(spec_data_shape, dtype=np.uint8)
+                self._quant_scratch = np.empty(len(self.freq_vector), dtype=np.float32)
+            self.spec_history_L.fill(0); self.spec_history_R.fill(0); self.hist_write_idx = 0 # Level 0 == spec_db_min
+            self._quant_scale = 255.0 / max(self.current_spec_db_max - self.current_spec_db_min, 1e-6)
+            self.window = _cached_window(WINDOW_TYPE, self.current_chunk_size); self.configure_plots()
         except Exception as e: show_qt_error("Calculation Error", f"Failed during recalculation/plot configuration:\n{e}")
 
-    # --- configure_plots (Unchanged - handles colormaps, fixed time) ---
+    # --- configure_plots (handles colormaps, fixed time) ---
     def configure_plots(self):
-        # ... (Function unchanged - handles colormaps, fixed time axis, legend) ...
         if self.freq_vector is None or self.time_vector is None: self.print_verbose("Error: Vectors not calculated..."); return
         plot_freq_max = self.current_sample_rate / 2; plot_freq_min = max(PLOT_FREQ_MIN_HZ, self.freq_vector[1] if len(self.freq_vector) > 1 else 0); safe_plot_freq_min = max(plot_freq_min, 1e-6)
-        is_log_scale = (self.current_freq_scale == 'Logarithmic'); cmap = None; self.print_verbose(f"Attempting to load colormap: '{self.current_colormap}'")
-        try: cmap = pg.colormap.get(self.current_colormap); self.print_verbose(f"-> Success using pg.colormap.get()")
-        except ValueError:
-            self.print_verbose(f"-> Failed pg.colormap.get(), trying matplotlib...")
-            try:
-                if 'matplotlib.cm' not in sys.modules: self.print_verbose("   -> Error: matplotlib.cm not imported."); raise ImportError
-                cmap = pg.colormap.getFromMatplotlib(self.current_colormap); self.print_verbose(f"-> Success using pg.colormap.getFromMatplotlib()")
-            except ImportError: self.print_verbose("   -> Matplotlib not installed or import failed."); cmap = pg.colormap.get('viridis'); self.print_verbose("   -> Falling back to 'viridis'.")
-            except ValueError: self.print_verbose(f"   -> Colormap '{self.current_colormap}' not found via getFromMatplotlib."); cmap = pg.colormap.get('viridis'); self.print_verbose("   -> Falling back to 'viridis'.")
-            except Exception as e: self.print_verbose(f"   -> Error getting colormap via matplotlib: {e}."); cmap = pg.colormap.get('viridis'); self.print_verbose("   -> Falling back to 'viridis'.")
-        except Exception as e: self.print_verbose(f"-> Error during initial pg.colormap.get(): {e}."); cmap = pg.colormap.get('viridis'); self.print_verbose("   -> Falling back to 'viridis'.")
-        if cmap is None: self.print_verbose("Error: Colormap object is None after checks. Using 'viridis'."); cmap = pg.colormap.get('viridis')
+        log_freq_min = np.log10(safe_plot_freq_min); log_freq_max = np.log10(plot_freq_max)
+        is_log_scale = (self.current_freq_scale == 'Logarithmic'); cmap, lut = get_colormap_lut(self.current_colormap); self.print_verbose(f"Using cached colormap: '{self.current_colormap}'")
+        colormap_dirty = (self._applied_colormap != self.current_colormap); self._applied_colormap = self.current_colormap # Gradient and LUT are only pushed when the colormap changes
         for plot, img, hist in [(self.plot_L_spec, self.img_L, self.hist_L), (self.plot_R_spec, self.img_R, self.hist_R)]:
             plot.setTitle(f"{'Left' if plot == self.plot_L_spec else 'Right'} Channel Spectrogram"); plot.setLabel('left', 'Frequency', units='Hz'); plot.setLabel('bottom', 'Time', units='s')
-            plot.setLogMode(x=False, y=is_log_scale); y_min_plot = np.log10(safe_plot_freq_min) if is_log_scale else plot_freq_min; y_max_plot = np.log10(plot_freq_max) if is_log_scale else plot_freq_max
+            plot.setLogMode(x=False, y=is_log_scale); y_min_plot = log_freq_min if is_log_scale else plot_freq_min; y_max_plot = log_freq_max if is_log_scale else plot_freq_max
             plot.setYRange(y_min_plot, y_max_plot); plot.setXRange(-HISTORY_SECONDS, 0)
             tr = QtGui.QTransform(); freq_span_plot = y_max_plot - y_min_plot; time_span = HISTORY_SECONDS; tr.translate(-HISTORY_SECONDS, y_min_plot)
             if self.history_frames_actual > 0 and len(self.freq_vector) > 0 and time_span > 0 and freq_span_plot > 0: tr.scale(time_span / self.history_frames_actual, freq_span_plot / len(self.freq_vector))
             else: self.print_verbose("Warning: Cannot set image transform.")
-            img.setTransform(tr); gradient_item = hist.gradient; gradient_item.setColorMap(cmap); hist.setLevels(self.current_spec_db_min, self.current_spec_db_max)
+            img.setTransform(tr); hist.setLevels(self.current_spec_db_min, self.current_spec_db_max); hist.setHistogramRange(self.current_spec_db_min, self.current_spec_db_max)
+            if colormap_dirty: hist.gradient.setColorMap(cmap); img.setLookupTable(lut); img.setLevels([0, 255]) # History is pre-quantized, so the LUT is indexed directly
         self.plot_freq_resp.setTitle("Instantaneous Frequency Response"); self.plot_freq_resp.setLabel('left', 'Magnitude', units='dBFS');
-        self.plot_freq_resp.setLogMode(x=True, y=False); self.plot_freq_resp.setXRange(np.log10(safe_plot_freq_min), np.log10(plot_freq_max)); resp_y_min = self.current_spec_db_min; resp_y_max = self.current_spec_db_max + self.current_resp_headroom
-        self.plot_freq_resp.setYRange(resp_y_min, resp_y_max)
+        self.custom_freq_axis.setLogMode(True); self.plot_freq_resp.setXRange(log_freq_min, log_freq_max); # Log ticks on the axis only: the PlotItem stays linear, so curves keep their pre-logged x data
+        resp_y_min = self.current_spec_db_min; resp_y_max = self.current_spec_db_max + self.current_resp_headroom
+        self.plot_freq_resp.setYRange(resp_y_min, resp_y_max); self._last_ylim = None # Next paint always applies its dynamic range
         if self.plot_freq_resp.legend is not None:
             try: vb = self.plot_freq_resp.getViewBox(); vb.removeItem(self.plot_freq_resp.legend)
             except Exception as leg_e: self.print_verbose(f"Note: Could not remove legend item cleanly: {leg_e}"); self.plot_freq_resp.legend.hide()
         self.plot_freq_resp.addLegend(offset=(-10, 10)); self.plot_freq_resp.showGrid(x=True, y=True, alpha=0.5)
-        if self.freq_vector is not None: self.curve_L.setData(self.freq_vector, np.full(len(self.freq_vector), self.current_spec_db_min)); self.curve_R.setData(self.freq_vector, np.full(len(self.freq_vector), self.current_spec_db_min))
+        if self.freq_vector is not None: self.curve_L.setData(self._log_freq_vector, np.full(len(self.freq_vector), self.current_spec_db_min)); self.curve_R.setData(self._log_freq_vector, np.full(len(self.freq_vector), self.current_spec_db_min))
 
     # --- START/STOP/HANDLER METHODS (Updated Start/Stop for Timer) ---
     def start_audio(self):
         if self.is_audio_running: self.print_verbose("Audio is already running."); return
         if not self.device: show_qt_warning("Audio Error", "No audio device selected."); return
-        self.print_verbose("Starting audio..."); self.audio_processor = None; self.audio_thread = None; self.window = get_window(WINDOW_TYPE, self.current_chunk_size)
+        self.print_verbose("Starting audio..."); self.audio_processor = None; self.audio_thread = None; self.window = _cached_window(WINDOW_TYPE, self.current_chunk_size)
         if self.window is None: show_qt_error("Error", f"Failed to create FFT window: {WINDOW_TYPE}"); return
 
         # Clear latest data buffers when starting
         self.latest_db_L = None
-        self.latest_db_R = None
+        self.latest_db_R = None; self.latest_peak_db = None
+        self._latest_db = np.zeros((2, self.n_fft // 2 + 1), dtype=np.float32) # L/R rows, same layout as a ring slot
+        self.frames_read = 0
 
-        self.audio_processor = AudioProcessor(self.device, self.current_sample_rate, self.current_chunk_size, self.n_fft, self.window)
+        self.audio_processor = AudioProcessor(self.device, self.current_sample_rate, self.current_chunk_size, self.n_fft, self.window, self.current_use_gpu)
         self.audio_thread = QtCore.QThread()
         self.audio_processor.moveToThread(self.audio_thread)
-        # *** Connect newData to handler, not directly to update_plots ***
-        self.audio_processor.newData.connect(self.handle_new_data)
-        # -------------------------------------------------------------
         self.audio_thread.started.connect(self.audio_processor.run); self.audio_processor.finished.connect(self.handle_audio_finished)
         self.audio_processor.errorOccurred.connect(self.handle_audio_error) # Connect error signal
         # *** Connect and start plot timer ***
-        self.plot_timer.timeout.connect(self.update_plots)
         self.plot_timer.start(UPDATE_INTERVAL_MS)
         # ---------------------------------
         self.is_audio_running = True; self.update_button_states(); self.audio_thread.start(); self.print_verbose("Audio thread start requested.")
@@ -355,66 +491,92 @@ class MainWindow(QtWidgets.QMainWindow):
         if self.is_audio_running: QtCore.QTimer.singleShot(0, self.stop_audio)
         else: self.is_audio_running = False; self.update_button_states()
 
-    # *** NEW Slot to handle data from audio thread ***
-    @QtCore.pyqtSlot(dict)
-    def handle_new_data(self, processed_data):
-        """Stores the latest processed data."""
-        self.latest_db_L = processed_data['db_L']
-        self.latest_db_R = processed_data['db_R']
+    # *** Audio ring drain, called by update_plots ***
+    def drain_audio_ring(self):
+        """Pulls every ring slot written since the last paint into the history as one batch, copying the newest into the latest-data buffer; False if none arrived."""
+        processor = self.audio_processor
+        if processor is None: return False
+        frames_written = processor.frames_written # Bumped only after a slot is fully written
+        if frames_written == self.frames_read: return False
+        first = max(self.frames_read, frames_written - AUDIO_RING_SLOTS + 1) # Frames older than the ring are lost; leave a slot for the writer
+        show_spectrogram = (self.display_mode == 'Spectrogram')
+        if not show_spectrogram: first = max(first, frames_written - 1) # Response view only needs the newest frame; history pauses
+        ring = processor.ring; ring_L = processor.ring_L; ring_R = processor.ring_R; ring_locks = processor.ring_locks; push = self.push_history_column # Hoisted out of the drain loop
+        last = frames_written - 1
+        for n in range(first, frames_written):
+            slot = n % AUDIO_RING_SLOTS
+            with QtCore.QMutexLocker(ring_locks[slot]):
+                if show_spectrogram: push(ring_L[slot], ring_R[slot])
+                if n == last: np.copyto(self._latest_db, ring[slot]); self.latest_peak_db = processor.ring_peak[slot] # Paints read a stable copy the writer cannot lap
+        self.latest_db_L, self.latest_db_R = self._latest_db
+        self.frames_read = frames_written; return True
+
+    def push_history_column(self, db_L, db_R):
+        """Quantizes one L/R frame to uint8 LUT levels into the history row at the ring write index (both tiles) and advances it."""
+        frames = self.history_frames_actual; hist_L = self.spec_history_L
+        if hist_L is None or hist_L.shape[0] != 2 * frames: return
+        row = self.hist_write_idx
+        _quantize_frame(db_L, db_R, self.current_spec_db_min, self._quant_scale, self._quant_scratch, hist_L, self.spec_history_R, row, frames)
+        self.hist_write_idx = (row + 1) % frames
     # ----------------------------------------------
 
     # *** update_plots now called by timer, uses stored data ***
     def update_plots(self):
         """Updates plot items based on display mode using latest stored data."""
+        if self.is_audio_running: self.plot_timer.start(UPDATE_INTERVAL_MS) # Next paint is due one interval after this one began, or right after it if it overruns
+        if not self.drain_audio_ring(): return # Nothing new since the last paint
+        if self.isMinimized() or not self.isVisible(): return # History keeps filling so it is current on restore; only drawing is skipped
         # Check if data has arrived yet
-        if self.latest_db_L is None or self.latest_db_R is None:
+        db_L = self.latest_db_L; db_R = self.latest_db_R
+        if db_L is None or db_R is None:
             return
 
-        try:
-            # Use self.latest_db_L and self.latest_db_R
-            db_L = self.latest_db_L
-            db_R = self.latest_db_R
-
-            if self.display_mode == 'Spectrogram':
-                db_L_clipped = np.clip(db_L, self.current_spec_db_min, self.current_spec_db_max)
-                db_R_clipped = np.clip(db_R, self.current_spec_db_min, self.current_spec_db_max)
-                if self.spec_history_L is None or self.spec_history_L.shape[1] != self.history_frames_actual: self.print_verbose(f"Warning: History buffer mismatch..."); self.recalculate_vars_and_configure_plots(); return
-                self.spec_history_L = np.roll(self.spec_history_L, -1, axis=1); self.spec_history_R = np.roll(self.spec_history_R, -1, axis=1); self.spec_history_L[:, -1] = db_L_clipped; self.spec_history_R[:, -1] = db_R_clipped
-                self.img_L.setImage(self.spec_history_L.T, autoLevels=False)
-                self.img_R.setImage(self.spec_history_R.T, autoLevels=False)
-            elif self.display_mode == 'FrequencyResponse':
-                if self.freq_vector is not None and len(self.freq_vector) == len(db_L):
-                     self.curve_L.setData(self.freq_vector, db_L)
-                     self.curve_R.setData(self.freq_vector, db_R)
-                try: # Dynamic Y range update
-                    current_max_db = max(np.max(db_L), np.max(db_R)) if len(db_L)>0 and len(db_R)>0 else self.current_spec_db_min; effective_max = max(current_max_db, self.current_spec_db_max); dynamic_ylim_max = effective_max + self.current_resp_headroom; dynamic_ylim_min = self.current_spec_db_min
-                    if dynamic_ylim_max > dynamic_ylim_min: self.plot_freq_resp.setYRange(dynamic_ylim_min, dynamic_ylim_max, padding=0)
-                except Exception as e_ylim: self.print_verbose(f" Minor error during dynamic Y lim update: {e_ylim}")
-
-        except Exception as e: self.print_verbose(f"Error during plot update: {type(e).__name__}: {e}", file=sys.stderr)
+        mode = self.display_mode; db_min = self.current_spec_db_min # Bind once per tick: locals are cheaper than attribute lookups
+        if mode == 'Spectrogram':
+            frames = self.history_frames_actual; hist_L = self.spec_history_L; hist_R = self.spec_history_R
+            if hist_L is None or hist_L.shape[0] != 2 * frames: self.print_verbose("Warning: History buffer mismatch..."); self.recalculate_vars_and_configure_plots(); return
+            # Oldest..newest is a C-contiguous row window of the tiled ring: no shifting, concatenation or transpose
+            start = self.hist_write_idx; stop = start + frames
+            self.img_L.setImage(hist_L[start:stop], autoLevels=False)
+            self.img_R.setImage(hist_R[start:stop], autoLevels=False)
+        elif mode == 'FrequencyResponse':
+            freq_vector = self.freq_vector; resp_x = self._resp_x; decimate = self.decimate_response
+            if freq_vector is not None and len(freq_vector) == len(db_L):
+                 self.curve_L.setData(resp_x, decimate(db_L, self._resp_y_L))
+                 self.curve_R.setData(resp_x, decimate(db_R, self._resp_y_R))
+            try: # Dynamic Y range update; the peak comes from the audio thread, so no per-paint array scans
+                effective_max = max(self.latest_peak_db, self.current_spec_db_max) + self.current_resp_headroom; prev_max = self._resp_ylim_max
+                dynamic_ylim_max = effective_max if prev_max is None or effective_max > prev_max else prev_max + RESP_YLIM_RELEASE * (effective_max - prev_max) # Jump up, ease down
+                self._resp_ylim_max = dynamic_ylim_max; dynamic_ylim_min = db_min
+                last_ylim = self._last_ylim # setYRange relayouts the axis, so skip changes below RESP_YLIM_STEP_DB
+                if dynamic_ylim_max > dynamic_ylim_min and (last_ylim is None or abs(dynamic_ylim_min - last_ylim[0]) >= RESP_YLIM_STEP_DB or abs(dynamic_ylim_max - last_ylim[1]) >= RESP_YLIM_STEP_DB):
+                    self.plot_freq_resp.setYRange(dynamic_ylim_min, dynamic_ylim_max, padding=0); self._last_ylim = (dynamic_ylim_min, dynamic_ylim_max)
+            except Exception as e_ylim: self.print_verbose(f" Minor error during dynamic Y lim update: {e_ylim}")
     # -------------------------------------------------------
 
+    def decimate_response(self, db, out): # Max-pool to ~RESP_CURVE_MAX_POINTS so peaks survive but sub-pixel segments are not drawn
+        if self._resp_stride == 1: return db
+        return np.max(db[:self._resp_len].reshape(-1, self._resp_stride), axis=1, out=out)
+
     def update_button_states(self): # Unchanged
         self.startButton.setEnabled(not self.is_audio_running); self.stopButton.setEnabled(self.is_audio_running)
 
     # --- Configuration Handling Methods ---
-    def open_config_dialog(self): # Unchanged
+    def open_config_dialog(self):
         if not hasattr(self, 'current_sample_rate'): show_qt_warning("Warning", "Cannot open config before initialization."); return
         current_settings = {'sample_rate': self.current_sample_rate, 'fft_size': self.current_fft_size, 'freq_scale': self.current_freq_scale, 'colormap': self.current_colormap,
                             'spec_db_min': self.current_spec_db_min, 'spec_db_max': self.current_spec_db_max, 'resp_headroom': self.current_resp_headroom,
-                            'verbose': self.verbose_console, 'suppress_warnings': self.suppress_warnings}
+                            'verbose': self.verbose_console, 'suppress_warnings': self.suppress_warnings, 'use_gpu': self.current_use_gpu}
         dialog = ConfigDialog(current_settings, self)
         if dialog.exec() == QtWidgets.QDialog.DialogCode.Accepted:
             new_settings = dialog.get_settings(); self.print_verbose(f"Config accepted: {new_settings}")
-            restart_required = (new_settings['sample_rate'] != self.current_sample_rate or new_settings['fft_size'] != self.current_fft_size)
-            recalc_needed = (restart_required or new_settings['freq_scale'] != self.current_freq_scale or new_settings['colormap'] != self.current_colormap or
-                             new_settings['spec_db_min'] != self.current_spec_db_min or new_settings['spec_db_max'] != self.current_spec_db_max or
-                             new_settings['resp_headroom'] != self.current_resp_headroom)
+            restart_required = (new_settings['sample_rate'] != self.current_sample_rate or new_settings['fft_size'] != self.current_fft_size or new_settings['use_gpu'] != self.current_use_gpu)
+            recalc_needed = restart_required or any(new_settings[key] != current_settings[key] for key in RECALC_KEYS)
             config_changed = any(current_settings.get(key) != new_settings.get(key) for key in current_settings if key in new_settings)
             if not config_changed: self.print_verbose("No configuration changes detected."); return
             proceed = True
             if restart_required:
-                reply = QtWidgets.QMessageBox.question(self, 'Restart Audio?', "Changing Sample Rate or FFT Size requires restarting the audio stream.\nProceed?", QtWidgets.QMessageBox.StandardButton.Ok | QtWidgets.QMessageBox.StandardButton.Cancel, QtWidgets.QMessageBox.StandardButton.Cancel)
+                reply = QtWidgets.QMessageBox.question(self, 'Restart Audio?', "Changing Sample Rate, FFT Size or GPU use requires restarting the audio stream.\nProceed?", QtWidgets.QMessageBox.StandardButton.Ok | QtWidgets.QMessageBox.StandardButton.Cancel, QtWidgets.QMessageBox.StandardButton.Cancel)
                 if reply == QtWidgets.QMessageBox.StandardButton.Cancel: self.print_verbose("Configuration change cancelled by user."); proceed = False
             if proceed: self.print_verbose("Applying new settings..."); self.apply_settings(new_settings, restart_required, recalc_needed)
         else: self.print_verbose("Config dialog cancelled.")
@@ -422,23 +584,15 @@ class MainWindow(QtWidgets.QMainWindow):
         was_running = self.is_audio_running
         if restart_needed and self.is_audio_running: self.stop_audio(); self.print_verbose("Waiting for audio to stop before applying settings..."); QtCore.QTimer.singleShot(200, lambda: self.finish_apply_settings(new_settings, was_running, restart_needed=True, recalc_needed=recalc_needed))
         else: self.finish_apply_settings(new_settings, was_running, restart_needed=restart_needed, recalc_needed=recalc_needed)
-    def finish_apply_settings(self, new_settings, was_running, restart_needed=True, recalc_needed=True): # Unchanged
+    def finish_apply_settings(self, new_settings, was_running, restart_needed=True, recalc_needed=True):
          self.print_verbose(f"Finishing apply settings (Restart={restart_needed}, Recalc={recalc_needed}, WasRunning={was_running})")
          try: # Apply settings...
-             config_changed_in_this_step = False; effective_recalc_needed = False
-             if self.current_sample_rate != new_settings.get('sample_rate', self.current_sample_rate): self.current_sample_rate = new_settings['sample_rate']; config_changed_in_this_step = True; effective_recalc_needed = True
-             if self.current_fft_size != new_settings.get('fft_size', self.current_fft_size): self.current_fft_size = new_settings['fft_size']; self.n_fft = self.current_fft_size; self.current_chunk_size = self.current_fft_size; config_changed_in_this_step = True; effective_recalc_needed = True
-             if self.current_freq_scale != new_settings.get('freq_scale', self.current_freq_scale): self.current_freq_scale = new_settings['freq_scale']; config_changed_in_this_step = True; effective_recalc_needed = True
-             if self.current_colormap != new_settings.get('colormap', self.current_colormap): self.current_colormap = new_settings['colormap']; config_changed_in_this_step = True; effective_recalc_needed = True
-             if self.current_spec_db_min != new_settings.get('spec_db_min', self.current_spec_db_min): self.current_spec_db_min = new_settings['spec_db_min']; config_changed_in_this_step = True; effective_recalc_needed = True
-             if self.current_spec_db_max != new_settings.get('spec_db_max', self.current_spec_db_max): self.current_spec_db_max = new_settings['spec_db_max']; config_changed_in_this_step = True; effective_recalc_needed = True
-             if self.current_resp_headroom != new_settings.get('resp_headroom', self.current_resp_headroom): self.current_resp_headroom = new_settings['resp_headroom']; config_changed_in_this_step = True; effective_recalc_needed = True
-             if self.verbose_console != new_settings.get('verbose', self.verbose_console): self.verbose_console = new_settings['verbose']; config_changed_in_this_step = True
-             if self.suppress_warnings != new_settings.get('suppress_warnings', self.suppress_warnings): self.suppress_warnings = new_settings['suppress_warnings']; update_warning_filter(self.suppress_warnings); config_changed_in_this_step = True
-             effective_recalc_needed = (self.current_sample_rate != new_settings.get('sample_rate', self.current_sample_rate) or self.current_fft_size != new_settings.get('fft_size', self.current_fft_size) or
-                                       self.current_freq_scale != new_settings.get('freq_scale', self.current_freq_scale) or self.current_colormap != new_settings.get('colormap', self.current_colormap) or
-                                       self.current_spec_db_min != new_settings.get('spec_db_min', self.current_spec_db_min) or self.current_spec_db_max != new_settings.get('spec_db_max', self.current_spec_db_max) or
-                                       self.current_resp_headroom != new_settings.get('resp_headroom', self.current_resp_headroom) )
+             diff = {key: value for key, value in new_settings.items() if key in SETTING_ATTRS and getattr(self, SETTING_ATTRS[key]) != value}
+             for key, value in diff.items(): setattr(self, SETTING_ATTRS[key], value)
+             if 'fft_size' in diff: self.n_fft = self.current_fft_size; self.current_chunk_size = self.current_fft_size
+             if 'suppress_warnings' in diff: update_warning_filter(self.suppress_warnings)
+             if 'verbose' in diff: self.set_verbose(self.verbose_console)
+             config_changed_in_this_step = bool(diff); effective_recalc_needed = not RECALC_KEYS.isdisjoint(diff)
              if recalc_needed or effective_recalc_needed: self.print_verbose("Recalculating vars and reconfiguring plots..."); self.recalculate_vars_and_configure_plots()
              elif config_changed_in_this_step: self.print_verbose("Settings changed but no plot reconfigure needed.")
              else: self.print_verbose("No settings actually changed value requiring action in this step.")
@@ -450,10 +604,9 @@ class MainWindow(QtWidgets.QMainWindow):
              self.update_button_states()
     # ---------------------------------------------------
 
-    def closeEvent(self, event): # Unchanged
-        self.print_verbose("Close event received."); self.stop_audio(); start_time = time.time()
-        while self.is_audio_running and (time.time() - start_time) < 1.5: QtCore.QCoreApplication.processEvents(); time.sleep(0.05)
-        if self.is_audio_running: print("Warning: Audio thread may not have fully stopped on close.")
+    def closeEvent(self, event):
+        self.print_verbose("Close event received."); self.stop_audio()
+        if self.audio_thread is not None and not self.audio_thread.wait(AUDIO_STOP_WAIT_MS): print("Warning: Audio thread may not have fully stopped on close.") # Returns as soon as the thread exits
         event.accept()
 
 